@@ -1,18 +1,37 @@
 import base64
-import json
 import logging
 import os
-from datetime import datetime, timedelta
-
-import requests
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from itertools import islice
+from urllib.parse import urlencode
+
+import orjson
+import urllib3
+from urllib3.util.retry import Retry
 
 logger = logging.getLogger("mcp-ebay-server")
 
+_loads = orjson.loads
+_dumps = orjson.dumps
+# Shared read-only default for missing nested objects in item payloads
+_EMPTY = {}
+
 DEFAULT_OAUTH_SCOPES = [
     "https://api.ebay.com/oauth/api_scope",
     "https://api.ebay.com/oauth/api_scope/buy.marketplace.insights",
 ]
 DEFAULT_TOKEN_FILE = "ebay_token.json"
+PAGE_FETCH_CONCURRENCY = 4
+# Browse/Marketplace Insights serve at most 200 items per page and refuse
+# offset + limit beyond 10,000
+MAX_PAGE_SIZE = 200
+MAX_SEARCH_RESULTS = 10000
+DEFAULT_BUYING_OPTIONS = ("AUCTION", "FIXED_PRICE")
+TOKEN_EXPIRY_MARGIN_SECONDS = 300
 
 EBAY_ENVIRONMENTS = {
     "production": {
@@ -26,6 +45,101 @@ EBAY_ENVIRONMENTS = {
 }
 
 
+# Pool default: only idempotent methods (urllib3's default allowed_methods) are
+# retried on transient statuses and read errors. Read retries are kept low since
+# each one can wait out the full timeout while holding a concurrency slot.
+# raise_on_status=False hands the final response back so callers keep reporting
+# eBay's error body once retries are exhausted.
+_IDEMPOTENT_RETRY = Retry(
+    total=5,
+    read=1,
+    backoff_factor=0.25,
+    backoff_jitter=0.25,
+    status_forcelist=(429, 500, 502, 503, 504),
+    respect_retry_after_header=True,
+    raise_on_status=False,
+)
+
+# POST/PATCH through the REST passthrough may not be safe to repeat, so they are
+# only retried when eBay says it never processed them (429/503) or the connection
+# was never made; a read timeout or other 5xx is surfaced instead of resent.
+_WRITE_RETRY = Retry(
+    total=3,
+    read=0,
+    other=0,
+    backoff_factor=0.25,
+    backoff_jitter=0.25,
+    status_forcelist=(429, 503),
+    allowed_methods=frozenset(["POST", "PATCH"]),
+    respect_retry_after_header=True,
+    raise_on_status=False,
+)
+_NON_IDEMPOTENT_METHODS = frozenset(["POST", "PATCH"])
+
+# Client-credentials grants just mint another token, so the OAuth POST can be
+# retried like a read.
+_TOKEN_RETRY = _IDEMPOTENT_RETRY.new(allowed_methods=frozenset(["POST"]))
+
+# urllib3 asks for identity encoding unless told otherwise, and pool-level headers
+# are dropped whenever a request passes its own, so every header dict carries this
+_ACCEPT_ENCODING = urllib3.make_headers(accept_encoding=True)
+
+
+def get_max_concurrency():
+    raw_value = os.getenv("EBAY_MAX_CONCURRENCY", "8")
+    try:
+        value = int(raw_value)
+    except ValueError:
+        raise RuntimeError(
+            f"EBAY_MAX_CONCURRENCY must be a positive integer, got {raw_value!r}"
+        ) from None
+    if value < 1:
+        raise RuntimeError(
+            f"EBAY_MAX_CONCURRENCY must be a positive integer, got {raw_value!r}"
+        )
+    return value
+
+
+# How many tool calls may talk to eBay at once; the server's semaphore and thread
+# pool and the connection pool below are all sized from it
+MAX_CONCURRENCY = get_max_concurrency()
+
+
+def _build_pool():
+    # One connection per concurrent tool call and per page worker, plus one for a
+    # token refresh, so no connection is ever discarded as surplus
+    return urllib3.PoolManager(
+        num_pools=4,
+        maxsize=MAX_CONCURRENCY + PAGE_FETCH_CONCURRENCY + 1,
+        retries=_IDEMPOTENT_RETRY,
+        timeout=30,
+    )
+
+
+# Shared across all eBay calls so keep-alive connections are reused. urllib3 is
+# used directly since requests' per-call session machinery buys us nothing here.
+_HTTP = _build_pool()
+_PAGE_EXECUTOR = ThreadPoolExecutor(
+    max_workers=PAGE_FETCH_CONCURRENCY, thread_name_prefix="ebay-page"
+)
+
+
+# Warm-path token lookups are served from memory; the file is only a fallback
+# for process restarts. Maps (client_id, client_secret) -> (token, expires_at).
+_TOKEN_CACHE = {}
+_TOKEN_LOCK = threading.Lock()
+
+
+# The pooled HTTP client shared by every eBay call in this module
+def get_session():
+    return _HTTP
+
+
+def close():
+    _PAGE_EXECUTOR.shutdown(wait=False, cancel_futures=True)
+    _HTTP.clear()
+
+
 def get_ebay_environment():
     env_name = os.getenv("EBAY_ENV", "production").strip().lower()
     if env_name not in EBAY_ENVIRONMENTS:
@@ -34,40 +148,84 @@ def get_ebay_environment():
         )
     return env_name, EBAY_ENVIRONMENTS[env_name]
 
+
+# Re-resolve EBAY_ENV and the URLs derived from it (e.g. after changing it in tests)
+def refresh_environment():
+    global _ENV_NAME, _OAUTH_URL, _API_BASE_URL, _BROWSE_SEARCH_URL, _SOLD_SEARCH_URL
+    _ENV_NAME, env_config = get_ebay_environment()
+    _OAUTH_URL = env_config["oauth_url"]
+    _API_BASE_URL = env_config["api_base_url"]
+    _BROWSE_SEARCH_URL = f"{_API_BASE_URL}/buy/browse/v1/item_summary/search"
+    _SOLD_SEARCH_URL = f"{_API_BASE_URL}/buy/marketplace_insights/v1_beta/item_sales/search"
+    # Tokens are issued per environment
+    _TOKEN_CACHE.clear()
+
+
+# EBAY_ENV is fixed for the life of the process, so resolve it once at import
+refresh_environment()
+
+
+def _cached_token(cache_key):
+    entry = _TOKEN_CACHE.get(cache_key)
+    if entry and time.monotonic() < entry[1] - TOKEN_EXPIRY_MARGIN_SECONDS:
+        return entry[0]
+    return None
+
+
+# Memory-only lookup: returns a still-valid cached token or None, never blocks on I/O
+def get_cached_access_token(CLIENT_ID, CLIENT_SECRET):
+    return _cached_token((CLIENT_ID, CLIENT_SECRET))
+
+
 # Function to generate an OAuth2 access token
 def get_access_token(CLIENT_ID, CLIENT_SECRET):
     if not CLIENT_ID or not CLIENT_SECRET:
         raise ValueError("Missing CLIENT_ID or CLIENT_SECRET environment variable")
 
+    cache_key = (CLIENT_ID, CLIENT_SECRET)
+    access_token = _cached_token(cache_key)
+    if access_token:
+        return access_token
+
+    with _TOKEN_LOCK:
+        # Another thread may have refreshed the token while we waited
+        access_token = _cached_token(cache_key)
+        if access_token:
+            return access_token
+
+        access_token, expires_in = _load_or_generate_token(CLIENT_ID, CLIENT_SECRET)
+        _TOKEN_CACHE[cache_key] = (access_token, time.monotonic() + expires_in)
+        return access_token
+
+
+def _load_or_generate_token(CLIENT_ID, CLIENT_SECRET):
     TOKEN_FILE = os.getenv("EBAY_TOKEN_FILE", DEFAULT_TOKEN_FILE)
-    env_name, env_config = get_ebay_environment()
-    oauth_url = env_config["oauth_url"]
     raw_scopes = os.getenv("EBAY_OAUTH_SCOPE")
     if raw_scopes:
         api_scope = raw_scopes
     else:
         api_scope = " ".join(DEFAULT_OAUTH_SCOPES)
 
-    logger.info(
-        "Generating eBay token using env=%s oauth_url=%s client_id_set=%s client_secret_set=%s",
-        env_name,
-        oauth_url,
-        bool(CLIENT_ID),
-        bool(CLIENT_SECRET),
-    )
-    # Check if the token already exists and is valid
+    # Check if the token already exists, is valid, and was issued for these
+    # credentials in this environment. Files without the owner fields (written by
+    # older versions) can't be attributed and are ignored.
     if os.path.exists(TOKEN_FILE):
-        with open(TOKEN_FILE, "r") as file:
-            token_data = json.load(file)
-            expiration_time = datetime.fromisoformat(token_data["expires_at"])
-            if expiration_time > datetime.now():
-                return token_data["access_token"]
+        with open(TOKEN_FILE, "rb") as file:
+            token_data = _loads(file.read())
+        if (
+            token_data.get("client_id") == CLIENT_ID
+            and token_data.get("env") == _ENV_NAME
+        ):
+            expires_in = token_data["expires_at_epoch"] - time.time()
+            if expires_in > TOKEN_EXPIRY_MARGIN_SECONDS:
+                return token_data["access_token"], expires_in
 
     # If the token is expired or doesn't exist, generate a new one
     auth = f"{CLIENT_ID}:{CLIENT_SECRET}"
     encoded_auth = base64.b64encode(auth.encode()).decode()
 
     headers = {
+        **_ACCEPT_ENCODING,
         "Content-Type": "application/x-www-form-urlencoded",
         "Authorization": f"Basic {encoded_auth}",
     }
@@ -77,26 +235,50 @@ def get_access_token(CLIENT_ID, CLIENT_SECRET):
         "scope": api_scope,
     }
 
-    response = requests.post(oauth_url, headers=headers, data=data, timeout=30)
-    if response.status_code == 200:
-        token_response = response.json()
+    logger.info(
+        "Generating eBay token using env=%s oauth_url=%s client_id_set=%s client_secret_set=%s",
+        _ENV_NAME,
+        _OAUTH_URL,
+        bool(CLIENT_ID),
+        bool(CLIENT_SECRET),
+    )
+    response = _HTTP.request(
+        "POST",
+        _OAUTH_URL,
+        headers=headers,
+        body=urlencode(data),
+        retries=_TOKEN_RETRY,
+    )
+    if response.status == 200:
+        token_response = _loads(response.data)
         access_token = token_response["access_token"]
         expires_in = token_response["expires_in"]
 
         # Store the token and expiration time locally
         token_data = {
             "access_token": access_token,
-            "expires_at": (datetime.now() + timedelta(seconds=expires_in)).isoformat(),
+            "expires_at_epoch": time.time() + expires_in,
+            "client_id": CLIENT_ID,
+            "env": _ENV_NAME,
         }
-        with open(TOKEN_FILE, "w") as file:
-            json.dump(token_data, file)
+        with open(TOKEN_FILE, "wb") as file:
+            file.write(_dumps(token_data))
 
-        return access_token
-    error_detail = response.text
-    raise RuntimeError(f"Error generating token: {response.status_code} {error_detail}")
+        return access_token, expires_in
+    error_detail = _response_text(response)
+    raise RuntimeError(f"Error generating token: {response.status} {error_detail}")
 
 # Function to make an authenticated eBay API request
 def _build_browse_filters(buying_options=None, category_ids=None):
+    # Normalize to hashable tuples so repeated filter shapes hit the cache
+    return _build_browse_filters_cached(
+        tuple(buying_options or ()),
+        tuple(category_ids or ()),
+    )
+
+
+@lru_cache(maxsize=128)
+def _build_browse_filters_cached(buying_options, category_ids):
     filters = []
     if buying_options:
         filters.append(f"buyingOptions:{{{'|'.join(buying_options)}}}")
@@ -106,78 +288,179 @@ def _build_browse_filters(buying_options=None, category_ids=None):
     return ",".join(filters)
 
 
+# Filter for the common call with default buying options and no categories
+_DEFAULT_ACTIVE_FILTER = _build_browse_filters(buying_options=DEFAULT_BUYING_OPTIONS)
+
+
 def _extract_price_fields(item):
-    price_data = item.get("currentBidPrice") or item.get("price") or {}
+    get = item.get
+    price_data = get("currentBidPrice") or get("price") or _EMPTY
     return price_data.get("value"), price_data.get("currency")
 
 
 def _format_active_listing(item):
+    get = item.get
     price, currency = _extract_price_fields(item)
     return {
-        "title": item.get("title"),
+        "item_id": get("itemId"),
+        "title": get("title"),
         "price": price,
         "currency": currency,
-        "end_date": item.get("itemEndDate"),
-        "item_url": item.get("itemWebUrl"),
-        "buying_options": item.get("buyingOptions"),
-        "condition": item.get("condition"),
-        "seller_username": item.get("seller", {}).get("username"),
-        "location": item.get("itemLocation", {}).get("postalCode"),
+        "end_date": get("itemEndDate"),
+        "item_url": get("itemWebUrl"),
+        "buying_options": get("buyingOptions"),
+        "condition": get("condition"),
+        "seller_username": (get("seller") or _EMPTY).get("username"),
+        "location": (get("itemLocation") or _EMPTY).get("postalCode"),
     }
 
 
 def _format_sold_listing(item):
-    price_data = item.get("price") or {}
+    get = item.get
+    price_data = get("price") or _EMPTY
     return {
-        "title": item.get("title"),
+        "item_id": get("itemId"),
+        "title": get("title"),
         "price": price_data.get("value"),
         "currency": price_data.get("currency"),
-        "sold_date": item.get("soldDate"),
-        "item_url": item.get("itemHref"),
-        "condition": item.get("condition"),
-        "seller_username": item.get("seller", {}).get("username"),
+        "sold_date": get("soldDate"),
+        "item_url": get("itemHref"),
+        "condition": get("condition"),
+        "seller_username": (get("seller") or _EMPTY).get("username"),
     }
 
 
+def _response_text(response):
+    return response.data.decode("utf-8", errors="replace")
+
+
+def _fetch_page(page_url, headers, offset, limit, results_key, formatter):
+    response = _HTTP.request(
+        "GET", f"{page_url}offset={offset}&limit={limit}", headers=headers
+    )
+    if response.status >= 400:
+        raise RuntimeError(
+            f"eBay API error: {response.status} {_response_text(response)} (env={_ENV_NAME})"
+        )
+
+    # Format while the page is in hand so raw item dicts never outlive their page;
+    # islice trims to the page budget in the same pass instead of copying a slice.
+    payload = _loads(response.data)
+    items = [formatter(item) for item in islice(payload.get(results_key, ()), limit)]
+    return items, payload.get("total")
+
+
+# Copies page_items into collected from index filled, skipping listings already
+# in seen (eBay repeats listings across pages at deep offsets). Rows without an
+# item_id are always kept. Returns the new fill level.
+def _stitch_unique(collected, filled, seen, page_items):
+    capacity = len(collected)
+    for item in page_items:
+        if filled == capacity:
+            break
+        item_id = item["item_id"]
+        if item_id is not None:
+            if item_id in seen:
+                continue
+            seen.add(item_id)
+        collected[filled] = item
+        filled += 1
+    return filled
+
+
 def _paginate_request(
     access_token,
-    path,
+    url,
     params,
     results_key,
     max_results,
+    formatter,
 ):
-    env_name, env_config = get_ebay_environment()
-    api_base_url = env_config["api_base_url"]
-    url = f"{api_base_url}{path}"
     headers = {
+        **_ACCEPT_ENCODING,
         "Authorization": f"Bearer {access_token}",
         "Content-Type": "application/json",
     }
-    collected = []
-    offset = 0
     page_limit = params.get("limit", 50)
+    # Encode the fixed query once; each page only appends its offset and limit
+    base_qs = urlencode(
+        {key: value for key, value in params.items() if key != "limit"}, doseq=True
+    )
+    page_url = f"{url}?{base_qs}&" if base_qs else f"{url}?"
+
+    # The first page tells us whether there is anything beyond it at all. eBay's
+    # total is an estimate, so it may only rule further pages out (nothing left past
+    # this page); beyond that, pagination stops at the first short page.
+    first_limit = min(page_limit, max_results)
+    first_page, total = _fetch_page(
+        page_url, headers, 0, first_limit, results_key, formatter
+    )
 
-    while len(collected) < max_results:
-        current_limit = min(page_limit, max_results - len(collected))
-        page_params = dict(params)
-        page_params["limit"] = current_limit
-        page_params["offset"] = offset
-
-        response = requests.get(url, headers=headers, params=page_params, timeout=30)
-        if response.status_code >= 400:
-            raise RuntimeError(
-                f"eBay API error: {response.status_code} {response.text} (env={env_name})"
+    # max_results bounds the output, so size the buffer once and fill it in place
+    collected = [None] * max_results
+    seen = set()
+    filled = _stitch_unique(collected, 0, seen, first_page)
+    more = len(first_page) == first_limit and (total is None or total > first_limit)
+    next_offset = first_limit
+
+    if more and filled < max_results:
+        # Fetch the remaining pages concurrently but keep at most
+        # PAGE_FETCH_CONCURRENCY of this call's pages outstanding, so a deep search
+        # can't monopolize the shared executor; pages are stitched in offset order
+        # and the next offset is submitted as each one is consumed.
+        offsets = iter(range(first_limit, max_results, page_limit))
+        pending = deque()
+
+        def submit_next():
+            offset = next(offsets, None)
+            if offset is None:
+                return
+            page_size = min(page_limit, max_results - offset)
+            pending.append(
+                (
+                    offset,
+                    page_size,
+                    _PAGE_EXECUTOR.submit(
+                        _fetch_page,
+                        page_url,
+                        headers,
+                        offset,
+                        page_size,
+                        results_key,
+                        formatter,
+                    ),
+                )
             )
 
-        payload = response.json()
-        page_items = payload.get(results_key, [])
-        if not page_items:
-            break
-        collected.extend(page_items)
-        if len(page_items) < current_limit:
-            break
-        offset += current_limit
+        try:
+            for _ in range(PAGE_FETCH_CONCURRENCY):
+                submit_next()
+            while pending:
+                offset, page_size, future = pending.popleft()
+                page_items, _ = future.result()
+                filled = _stitch_unique(collected, filled, seen, page_items)
+                next_offset = offset + page_size
+                if len(page_items) < page_size:
+                    more = False
+                    break
+                submit_next()
+        finally:
+            for _, _, future in pending:
+                future.cancel()
+
+    # Dropped duplicates leave the buffer short; keep paging sequentially past the
+    # planned offsets until it is full or eBay runs out
+    while more and filled < max_results and next_offset < MAX_SEARCH_RESULTS:
+        page_size = min(page_limit, MAX_SEARCH_RESULTS - next_offset)
+        page_items, _ = _fetch_page(
+            page_url, headers, next_offset, page_size, results_key, formatter
+        )
+        filled = _stitch_unique(collected, filled, seen, page_items)
+        more = len(page_items) == page_size
+        next_offset += page_size
 
+    if filled < max_results:
+        del collected[filled:]
     return collected
 
 
@@ -189,29 +472,30 @@ def search_active_listings(
     category_ids=None,
     sort=None,
 ):
-    if not buying_options:
-        buying_options = ["AUCTION", "FIXED_PRICE"]
-    filters = _build_browse_filters(
-        buying_options=buying_options,
-        category_ids=category_ids,
-    )
+    if not buying_options and not category_ids:
+        filters = _DEFAULT_ACTIVE_FILTER
+    else:
+        filters = _build_browse_filters(
+            buying_options=buying_options or DEFAULT_BUYING_OPTIONS,
+            category_ids=category_ids,
+        )
     params = {
         "q": query,
-        "limit": min(limit, 200),
+        "limit": min(limit, MAX_PAGE_SIZE),
     }
     if filters:
         params["filter"] = filters
     if sort:
         params["sort"] = sort
 
-    items = _paginate_request(
+    return _paginate_request(
         access_token=access_token,
-        path="/buy/browse/v1/item_summary/search",
+        url=_BROWSE_SEARCH_URL,
         params=params,
         results_key="itemSummaries",
         max_results=limit,
+        formatter=_format_active_listing,
     )
-    return [_format_active_listing(item) for item in items]
 
 
 def search_sold_listings(
@@ -221,10 +505,10 @@ def search_sold_listings(
     category_ids=None,
     sort=None,
 ):
-    filters = _build_browse_filters(category_ids=category_ids)
+    filters = _build_browse_filters(category_ids=category_ids) if category_ids else ""
     params = {
         "q": query,
-        "limit": min(limit, 200),
+        "limit": min(limit, MAX_PAGE_SIZE),
     }
     if filters:
         params["filter"] = filters
@@ -232,12 +516,13 @@ def search_sold_listings(
         params["sort"] = sort
 
     try:
-        items = _paginate_request(
+        return _paginate_request(
             access_token=access_token,
-            path="/buy/marketplace_insights/v1_beta/item_sales/search",
+            url=_SOLD_SEARCH_URL,
             params=params,
             results_key="itemSales",
             max_results=limit,
+            formatter=_format_sold_listing,
         )
     except RuntimeError as exc:
         message = str(exc)
@@ -248,7 +533,6 @@ def search_sold_listings(
                 "is requested and the app is approved."
             ) from exc
         raise
-    return [_format_sold_listing(item) for item in items]
 
 
 def make_ebay_api_request(
@@ -277,34 +561,41 @@ def make_ebay_rest_request(
     params=None,
     json_body=None,
 ):
-    env_name, env_config = get_ebay_environment()
-    api_base_url = env_config["api_base_url"]
     normalized_path = path if path.startswith("/") else f"/{path}"
-    url = f"{api_base_url}{normalized_path}"
+    url = f"{_API_BASE_URL}{normalized_path}"
+    # Like requests: None-valued params are dropped and a query string already in
+    # the path is extended rather than doubled
+    query_string = urlencode(
+        {key: value for key, value in (params or _EMPTY).items() if value is not None},
+        doseq=True,
+    )
+    if query_string:
+        url = f"{url}{'&' if '?' in url else '?'}{query_string}"
 
     headers = {
+        **_ACCEPT_ENCODING,
         "Authorization": f"Bearer {access_token}",
         "Content-Type": "application/json",
     }
 
-    response = requests.request(
-        method=method.upper(),
-        url=url,
+    response = _HTTP.request(
+        method,
+        url,
         headers=headers,
-        params=params,
-        json=json_body,
-        timeout=30,
+        body=_dumps(json_body) if json_body is not None else None,
+        retries=_WRITE_RETRY if method in _NON_IDEMPOTENT_METHODS else _IDEMPOTENT_RETRY,
     )
 
-    if response.status_code >= 400:
+    if response.status >= 400:
         raise RuntimeError(
-            f"eBay REST API error: {response.status_code} {response.text} (env={env_name})"
+            f"eBay REST API error: {response.status} {_response_text(response)} "
+            f"(env={_ENV_NAME})"
         )
 
-    if response.text:
+    if response.data:
         try:
-            return response.json()
-        except json.JSONDecodeError:
-            return response.text
+            return _loads(response.data)
+        except orjson.JSONDecodeError:
+            return _response_text(response)
 
     return None
@@ -1,4 +1,5 @@
 import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from mcp.server.models import InitializationOptions
 import mcp.types as types
 from mcp.server import NotificationOptions, Server
@@ -6,9 +7,25 @@ import mcp.server.stdio
 from pydantic import AnyUrl
 import logging
 import os
+from collections.abc import Awaitable, Callable, Mapping
+from types import MappingProxyType
+from typing import Any
+
+import fastjsonschema
+import orjson
+from cachetools import TTLCache
+
+try:
+    import uvloop
+except ImportError:  # optional speedup; not available on Windows
+    uvloop = None
 
 from ebayAPItool import (
+    MAX_CONCURRENCY,
+    MAX_SEARCH_RESULTS,
+    close as close_ebay_session,
     get_access_token,
+    get_cached_access_token,
     make_ebay_rest_request,
     search_active_listings,
     search_sold_listings,
@@ -19,6 +36,66 @@ logger = logging.getLogger("mcp-ebay-server")
 logger.setLevel(logging.INFO)
 
 
+class ToolInputError(ValueError):
+    """
+    Tool arguments the caller must fix; reported without a traceback.
+    """
+
+
+# Credentials are fixed for the life of the process; main() refuses to start without them
+CLIENT_ID = os.getenv("CLIENT_ID")
+CLIENT_SECRET = os.getenv("CLIENT_SECRET")
+
+# Blocking eBay calls run on the loop's default executor: one thread per tool call
+# the semaphore lets through, plus one for a token refresh, so admitted calls never
+# queue for a thread.
+TOOL_CALL_THREADS = MAX_CONCURRENCY + 1
+
+# Caps how many tool calls talk to eBay at once (EBAY_MAX_CONCURRENCY) so bursts
+# queue here instead of tripping eBay's rate limits. Each paginated call may itself
+# have several page requests in flight.
+_EBAY_SEM = asyncio.Semaphore(MAX_CONCURRENCY)
+
+# Identical searches within a minute are answered from memory. Only the read-only
+# search tools are cached; ebay-api-request may mutate state and always goes out.
+# The cache is sized in result rows, not entries, and large result sets are not
+# cached at all so a few deep searches can't pin tens of thousands of rows.
+SEARCH_CACHE_MAX_ROWS = 5000
+SEARCH_CACHE_MAX_ROWS_PER_ENTRY = 500
+_SEARCH_CACHE = TTLCache(maxsize=SEARCH_CACHE_MAX_ROWS, ttl=60, getsizeof=len)
+
+
+def _cache_search_results(cache_key, results):
+    if len(results) <= SEARCH_CACHE_MAX_ROWS_PER_ENTRY:
+        _SEARCH_CACHE[cache_key] = results
+
+
+def _search_cache_key(tool, query, limit, buying_options, category_ids, sort):
+    return (
+        tool,
+        query.strip().lower(),
+        limit,
+        tuple(sorted(buying_options or ())),
+        tuple(sorted(str(category_id) for category_id in category_ids or ())),
+        sort,
+    )
+
+
+# Single-flight token refresh: concurrent calls on a cold cache wait for one
+# refresh instead of each tying up a worker thread on the token lock.
+_TOKEN_REFRESH_LOCK = asyncio.Lock()
+
+
+async def _cached_access_token():
+    # A warm token is a dict lookup, so serve it on the loop without a thread hop
+    access_token = get_cached_access_token(CLIENT_ID, CLIENT_SECRET)
+    if access_token:
+        return access_token
+    logger.debug("token cache miss; refreshing")
+    async with _TOKEN_REFRESH_LOCK:
+        return await asyncio.to_thread(get_access_token, CLIENT_ID, CLIENT_SECRET)
+
+
 ## Logging
 @server.set_logging_level()
 async def set_logging_level(level: types.LoggingLevel) -> types.EmptyResult:
@@ -30,108 +107,270 @@ async def set_logging_level(level: types.LoggingLevel) -> types.EmptyResult:
 
 
 ## Tools
+LIST_ACTIVE_LISTINGS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "query": {
+            "type": "string",
+            "minLength": 1,
+            "description": "The search query.",
+        },
+        "limit": {
+            "type": "integer",
+            "description": "Maximum number of listings to return (paginated, defaults to 50).",
+        },
+        "buying_options": {
+            "type": "array",
+            "items": {"type": "string"},
+            "description": "Buying options to include (AUCTION, FIXED_PRICE).",
+        },
+        "category_ids": {
+            "type": "array",
+            "items": {"type": "integer"},
+            "description": "Optional category IDs to restrict search results.",
+        },
+        "sort": {
+            "type": "string",
+            "description": "Optional sort order (e.g. BEST_MATCH, END_DATE_SOONEST).",
+        },
+    },
+    "required": ["query"],
+}
+
+LIST_SOLD_LISTINGS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "query": {
+            "type": "string",
+            "minLength": 1,
+            "description": "The search query.",
+        },
+        "limit": {
+            "type": "integer",
+            "description": (
+                "Maximum number of sold listings to return (paginated, defaults to 50)."
+            ),
+        },
+        "category_ids": {
+            "type": "array",
+            "items": {"type": "integer"},
+            "description": "Optional category IDs to restrict search results.",
+        },
+        "sort": {
+            "type": "string",
+            "description": "Optional sort order (e.g. SOLD_DATE_DESC).",
+        },
+    },
+    "required": ["query"],
+}
+
+EBAY_API_REQUEST_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "method": {
+            "type": "string",
+            "minLength": 1,
+            "description": "HTTP method to use (GET, POST, PUT, PATCH, DELETE).",
+        },
+        "path": {
+            "type": "string",
+            "minLength": 1,
+            "description": "API path, e.g. /buy/browse/v1/item_summary/search.",
+        },
+        "params": {
+            "type": "object",
+            "description": "Query parameters for the request.",
+        },
+        "json_body": {
+            "type": "object",
+            "description": "JSON request body for POST/PUT/PATCH requests.",
+        },
+    },
+    "required": ["method", "path"],
+}
+
+# Compiled once from the same schemas advertised in list_tools
+_VALIDATORS = MappingProxyType(
+    {
+        "list-active-listings": fastjsonschema.compile(LIST_ACTIVE_LISTINGS_SCHEMA),
+        "list-sold-listings": fastjsonschema.compile(LIST_SOLD_LISTINGS_SCHEMA),
+        "ebay-api-request": fastjsonschema.compile(EBAY_API_REQUEST_SCHEMA),
+    }
+)
+
+# Methods ebay-api-request may send, normalized to upper case
+_ALLOWED_METHODS = frozenset({"GET", "POST", "PUT", "PATCH", "DELETE"})
+
+
+def _normalize_rest_arguments(arguments):
+    method = arguments["method"].upper()
+    if method not in _ALLOWED_METHODS:
+        raise ToolInputError(f"Unsupported method: {method!r}")
+    return {**arguments, "method": method}
+
+
+# Optional per-tool checks beyond the schema; each returns the normalized arguments
+_NORMALIZERS = MappingProxyType(
+    {
+        "ebay-api-request": _normalize_rest_arguments,
+    }
+)
+
+# The tool definitions are static, so build them once instead of on every list_tools
+_TOOLS: list[types.Tool] = [
+    types.Tool(
+        name="list-active-listings",
+        description=(
+            "Search active eBay listings (auctions + fixed price). "
+            "Returns structured fields like price, currency, and end date when available."
+        ),
+        inputSchema=LIST_ACTIVE_LISTINGS_SCHEMA,
+    ),
+    types.Tool(
+        name="list-sold-listings",
+        description=(
+            "Search sold eBay listings (Marketplace Insights API). "
+            "Requires the buy.marketplace.insights scope."
+        ),
+        inputSchema=LIST_SOLD_LISTINGS_SCHEMA,
+    ),
+    types.Tool(
+        name="ebay-api-request",
+        description=(
+            "Call any eBay REST API endpoint (Browse, Buy, Order, Inventory, etc.). "
+            "Provide the path starting after the base URL, e.g. "
+            "`/buy/browse/v1/item_summary/search`."
+        ),
+        inputSchema=EBAY_API_REQUEST_SCHEMA,
+    ),
+]
+
+
 @server.list_tools()
 async def handle_list_tools() -> list[types.Tool]:
     """
     List available search tools.
     """
-    return [
-        types.Tool(
-            name="list-active-listings",
-            description=(
-                "Search active eBay listings (auctions + fixed price). "
-                "Returns structured fields like price, currency, and end date when available."
-            ),
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "query": {
-                        "type": "string",
-                        "description": "The search query.",
-                    },
-                    "limit": {
-                        "type": "integer",
-                        "description": "Maximum number of listings to return (paginated).",
-                    },
-                    "buying_options": {
-                        "type": "array",
-                        "items": {"type": "string"},
-                        "description": "Buying options to include (AUCTION, FIXED_PRICE).",
-                    },
-                    "category_ids": {
-                        "type": "array",
-                        "items": {"type": "integer"},
-                        "description": "Optional category IDs to restrict search results.",
-                    },
-                    "sort": {
-                        "type": "string",
-                        "description": "Optional sort order (e.g. BEST_MATCH, END_DATE_SOONEST).",
-                    },
-                },
-                "required": ["query", "limit"],
-            },
-        ),
-        types.Tool(
-            name="list-sold-listings",
-            description=(
-                "Search sold eBay listings (Marketplace Insights API). "
-                "Requires the buy.marketplace.insights scope."
-            ),
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "query": {
-                        "type": "string",
-                        "description": "The search query.",
-                    },
-                    "limit": {
-                        "type": "integer",
-                        "description": "Maximum number of sold listings to return (paginated).",
-                    },
-                    "category_ids": {
-                        "type": "array",
-                        "items": {"type": "integer"},
-                        "description": "Optional category IDs to restrict search results.",
-                    },
-                    "sort": {
-                        "type": "string",
-                        "description": "Optional sort order (e.g. SOLD_DATE_DESC).",
-                    },
-                },
-                "required": ["query", "limit"],
-            },
-        ),
-        types.Tool(
-            name="ebay-api-request",
-            description=(
-                "Call any eBay REST API endpoint (Browse, Buy, Order, Inventory, etc.). "
-                "Provide the path starting after the base URL, e.g. "
-                "`/buy/browse/v1/item_summary/search`."
+    return _TOOLS
+
+
+# Per-tool handlers. Each takes the tool arguments and returns the payload to
+# serialize, fetching a token only when it actually goes out to eBay, so handlers
+# are self-contained coroutines that compose under asyncio.gather. The eBay client
+# is blocking, so network calls run off the event loop and concurrent tool calls
+# are not stalled behind them.
+async def _do_list_active_listings(arguments):
+    query = arguments.get("query")
+    limit = arguments.get("limit")
+    buying_options = arguments.get("buying_options")
+    category_ids = arguments.get("category_ids")
+    sort = arguments.get("sort")
+
+    limit = max(1, min(int(limit or 50), MAX_SEARCH_RESULTS))
+
+    cache_key = _search_cache_key(
+        "active", query, limit, buying_options, category_ids, sort
+    )
+    results = _SEARCH_CACHE.get(cache_key)
+    if results is not None:
+        logger.debug("search cache hit for %r", cache_key)
+        return results
+
+    access_token = await _cached_access_token()
+    async with _EBAY_SEM:
+        results = await asyncio.to_thread(
+            search_active_listings,
+            access_token=access_token,
+            query=query,
+            limit=limit,
+            buying_options=buying_options,
+            category_ids=category_ids,
+            sort=sort,
+        )
+    _cache_search_results(cache_key, results)
+    return results
+
+
+async def _do_list_sold_listings(arguments):
+    query = arguments.get("query")
+    limit = arguments.get("limit")
+    category_ids = arguments.get("category_ids")
+    sort = arguments.get("sort")
+
+    limit = max(1, min(int(limit or 50), MAX_SEARCH_RESULTS))
+
+    cache_key = _search_cache_key("sold", query, limit, None, category_ids, sort)
+    results = _SEARCH_CACHE.get(cache_key)
+    if results is not None:
+        logger.debug("search cache hit for %r", cache_key)
+        return results
+
+    access_token = await _cached_access_token()
+    async with _EBAY_SEM:
+        results = await asyncio.to_thread(
+            search_sold_listings,
+            access_token=access_token,
+            query=query,
+            limit=limit,
+            category_ids=category_ids,
+            sort=sort,
+        )
+    _cache_search_results(cache_key, results)
+    return results
+
+
+async def _do_rest_request(arguments):
+    method = arguments["method"]
+    path = arguments.get("path")
+    params = arguments.get("params")
+    json_body = arguments.get("json_body")
+
+    access_token = await _cached_access_token()
+    async with _EBAY_SEM:
+        return await asyncio.to_thread(
+            make_ebay_rest_request,
+            access_token=access_token,
+            method=method,
+            path=path,
+            params=params,
+            json_body=json_body,
+        )
+
+
+_DISPATCH: Mapping[str, Callable[[dict], Awaitable[Any]]] = MappingProxyType(
+    {
+        "list-active-listings": _do_list_active_listings,
+        "list-sold-listings": _do_list_sold_listings,
+        "ebay-api-request": _do_rest_request,
+    }
+)
+
+
+# Raw REST responses go out as a typed JSON resource rather than inline text; the
+# search tools already return compact, projected rows.
+_RESOURCE_TOOLS = frozenset({"ebay-api-request"})
+_RESOURCE_URI = AnyUrl("ebay://last-response")
+
+
+def _to_content(name, response_payload):
+    # Plain-text bodies pass through; everything else goes out as real JSON
+    if isinstance(response_payload, str):
+        return types.TextContent(type="text", text=response_payload)
+    try:
+        text = orjson.dumps(response_payload, option=orjson.OPT_NON_STR_KEYS).decode()
+    except orjson.JSONEncodeError:
+        return types.TextContent(type="text", text=str(response_payload))
+
+    if name in _RESOURCE_TOOLS:
+        return types.EmbeddedResource(
+            type="resource",
+            resource=types.TextResourceContents(
+                uri=_RESOURCE_URI,
+                mimeType="application/json",
+                text=text,
             ),
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "method": {
-                        "type": "string",
-                        "description": "HTTP method to use (GET, POST, PUT, PATCH, DELETE).",
-                    },
-                    "path": {
-                        "type": "string",
-                        "description": "API path, e.g. /buy/browse/v1/item_summary/search.",
-                    },
-                    "params": {
-                        "type": "object",
-                        "description": "Query parameters for the request.",
-                    },
-                    "json_body": {
-                        "type": "object",
-                        "description": "JSON request body for POST/PUT/PATCH requests.",
-                    },
-                },
-                "required": ["method", "path"],
-            },
-        ),
-    ]
+        )
+    return types.TextContent(type="text", text=text)
 
 
 @server.call_tool()
@@ -141,85 +380,27 @@ async def handle_call_tool(
     """
     Handle search tool execution requests.
     """
-    if name not in {
-        "list-active-listings",
-        "list-sold-listings",
-        "ebay-api-request",
-    }:
+    handler = _DISPATCH.get(name)
+    if handler is None:
         raise ValueError(f"Unknown tool: {name}")
 
-    if not arguments:
-        raise ValueError("Missing arguments")
-
-    CLIENT_ID = os.getenv("CLIENT_ID")
-    CLIENT_SECRET = os.getenv("CLIENT_SECRET")
-
+    # Bad arguments are rejected as MCP errors before any eBay work starts
+    arguments = arguments or {}
     try:
-        access_token = get_access_token(CLIENT_ID, CLIENT_SECRET)
-
-        if name == "list-active-listings":
-            query = arguments.get("query")
-            limit = arguments.get("limit")
-            buying_options = arguments.get("buying_options")
-            category_ids = arguments.get("category_ids")
-            sort = arguments.get("sort")
-
-            if not query:
-                raise ValueError("Missing query")
-            if not limit:
-                limit = 50
-
-            response_payload = search_active_listings(
-                access_token=access_token,
-                query=query,
-                limit=limit,
-                buying_options=buying_options,
-                category_ids=category_ids,
-                sort=sort,
-            )
-        elif name == "list-sold-listings":
-            query = arguments.get("query")
-            limit = arguments.get("limit")
-            category_ids = arguments.get("category_ids")
-            sort = arguments.get("sort")
-
-            if not query:
-                raise ValueError("Missing query")
-            if not limit:
-                limit = 50
-
-            response_payload = search_sold_listings(
-                access_token=access_token,
-                query=query,
-                limit=limit,
-                category_ids=category_ids,
-                sort=sort,
-            )
-        else:
-            method = arguments.get("method")
-            path = arguments.get("path")
-            params = arguments.get("params")
-            json_body = arguments.get("json_body")
-
-            if not method:
-                raise ValueError("Missing method")
-            if not path:
-                raise ValueError("Missing path")
-
-            response_payload = make_ebay_rest_request(
-                access_token=access_token,
-                method=method,
-                path=path,
-                params=params,
-                json_body=json_body,
-            )
+        _VALIDATORS[name](arguments)
+        normalizer = _NORMALIZERS.get(name)
+        if normalizer is not None:
+            arguments = normalizer(arguments)
+    except (fastjsonschema.JsonSchemaException, ToolInputError) as exc:
+        logger.warning("Rejected %s call: %s", name, exc)
+        raise
+    # Only pay for serializing the arguments when someone is reading debug logs
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Calling %s with %s", name, orjson.dumps(arguments).decode())
 
-        return [
-            types.TextContent(
-                type="text",
-                text=str(response_payload),
-            )
-        ]
+    try:
+        response_payload = await handler(arguments)
+        return [_to_content(name, response_payload)]
     except Exception as exc:
         logger.exception("eBay API call failed")
         return [
@@ -231,21 +412,33 @@ async def handle_call_tool(
 
 
 async def main():
+    if not CLIENT_ID or not CLIENT_SECRET:
+        raise RuntimeError("Missing CLIENT_ID or CLIENT_SECRET environment variable")
+
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=TOOL_CALL_THREADS, thread_name_prefix="ebay-tool")
+    )
     # Run the server using stdin/stdout streams
-    async with mcp.server.stdio.stdio_server() as (read_stream, write_stream):
-        await server.run(
-            read_stream,
-            write_stream,
-            InitializationOptions(
-                server_name="mcp-ebay-server",
-                server_version="0.1.0",
-                capabilities=server.get_capabilities(
-                    notification_options=NotificationOptions(),
-                    experimental_capabilities={},
+    try:
+        async with mcp.server.stdio.stdio_server() as (read_stream, write_stream):
+            await server.run(
+                read_stream,
+                write_stream,
+                InitializationOptions(
+                    server_name="mcp-ebay-server",
+                    server_version="0.1.0",
+                    capabilities=server.get_capabilities(
+                        notification_options=NotificationOptions(),
+                        experimental_capabilities={},
+                    ),
                 ),
-            ),
-        )
+            )
+    finally:
+        close_ebay_session()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    if uvloop is not None:
+        uvloop.run(main())
+    else:
+        asyncio.run(main())
@@ -0,0 +1,162 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import orjson
+import pytest
+import urllib3
+
+import ebayAPItool
+
+
+class _Response:
+    def __init__(self, payload, status=200):
+        self.status = status
+        self.data = orjson.dumps(payload)
+
+
+class StubHTTP:
+    """
+    Serves item_summary pages from a fixed list of item ids, reporting `total`
+    (defaults to the real count) and recording each (offset, limit) requested.
+    """
+
+    def __init__(self, item_ids, total=None):
+        self.item_ids = item_ids
+        self.total = len(item_ids) if total is None else total
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def request(self, method, url, headers=None, **kwargs):
+        query = parse_qs(urlsplit(url).query)
+        offset = int(query["offset"][0])
+        limit = int(query["limit"][0])
+        with self._lock:
+            self.calls.append((offset, limit))
+        items = [
+            {"itemId": item_id, "title": f"item {item_id}"}
+            for item_id in self.item_ids[offset : offset + limit]
+        ]
+        return _Response({"total": self.total, "itemSummaries": items})
+
+
+def _search(monkeypatch, stub, limit):
+    monkeypatch.setattr(ebayAPItool, "_HTTP", stub)
+    return ebayAPItool.search_active_listings("token", "query", limit)
+
+
+def _ids(results):
+    return [row["item_id"] for row in results]
+
+
+def test_short_first_page_stops(monkeypatch):
+    stub = StubHTTP([str(i) for i in range(30)])
+    results = _search(monkeypatch, stub, 500)
+    assert _ids(results) == [str(i) for i in range(30)]
+    assert stub.calls == [(0, 200)]
+
+
+def test_zero_total_makes_one_request(monkeypatch):
+    stub = StubHTTP([], total=0)
+    assert _search(monkeypatch, stub, 450) == []
+    assert stub.calls == [(0, 200)]
+
+
+def test_under_reported_total_keeps_paging(monkeypatch):
+    stub = StubHTTP([str(i) for i in range(1000)], total=250)
+    results = _search(monkeypatch, stub, 450)
+    assert _ids(results) == [str(i) for i in range(450)]
+    assert sorted(stub.calls) == [(0, 200), (200, 200), (400, 50)]
+
+
+def test_duplicates_across_pages_are_refilled(monkeypatch):
+    # Every 7th listing repeats the one before it
+    item_ids = [str(i - 1) if i % 7 == 0 else str(i) for i in range(1, 1001)]
+    stub = StubHTTP(item_ids)
+    results = _search(monkeypatch, stub, 600)
+    ids = _ids(results)
+    assert len(ids) == 600
+    assert len(set(ids)) == 600
+    # The planned pages stop at offset 600; the shortfall is refilled past it
+    assert (600, 200) in stub.calls
+
+
+def test_stops_at_result_window(monkeypatch):
+    # Enough duplicates that the buffer never fills before eBay's 10,000 window
+    item_ids = [str(i // 2) for i in range(20000)]
+    stub = StubHTTP(item_ids)
+    results = _search(monkeypatch, stub, ebayAPItool.MAX_SEARCH_RESULTS)
+    assert len(results) == ebayAPItool.MAX_SEARCH_RESULTS // 2
+    assert max(offset + limit for offset, limit in stub.calls) == (
+        ebayAPItool.MAX_SEARCH_RESULTS
+    )
+
+
+class _CountingHandler(BaseHTTPRequestHandler):
+    hits = []
+    delay = 0
+    status = 500
+
+    def _reply(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        self.rfile.read(length)
+        self.hits.append(self.command)
+        time.sleep(self.delay)
+        body = b'{"errors": []}'
+        try:
+            self.send_response(self.status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except OSError:
+            pass
+
+    do_GET = do_POST = _reply
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def local_api(monkeypatch):
+    _CountingHandler.hits = []
+    _CountingHandler.delay = 0
+    _CountingHandler.status = 500
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _CountingHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    # Same retry policies, minus the backoff sleeps
+    for name in ("_IDEMPOTENT_RETRY", "_WRITE_RETRY"):
+        policy = getattr(ebayAPItool, name).new(backoff_factor=0, backoff_jitter=0)
+        monkeypatch.setattr(ebayAPItool, name, policy)
+    pool = urllib3.PoolManager(retries=ebayAPItool._IDEMPOTENT_RETRY, timeout=0.5)
+    monkeypatch.setattr(ebayAPItool, "_HTTP", pool)
+    monkeypatch.setattr(
+        ebayAPItool, "_API_BASE_URL", f"http://127.0.0.1:{httpd.server_port}"
+    )
+    yield _CountingHandler
+    pool.clear()
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_post_not_resent_after_500(local_api):
+    with pytest.raises(RuntimeError, match="500"):
+        ebayAPItool.make_ebay_rest_request("token", "POST", "/sell/order", json_body={})
+    assert local_api.hits == ["POST"]
+
+
+def test_get_retried_after_500(local_api):
+    with pytest.raises(RuntimeError, match="500"):
+        ebayAPItool.make_ebay_rest_request("token", "GET", "/buy/browse/v1/item/1")
+    assert len(local_api.hits) > 1
+
+
+def test_post_not_resent_after_read_timeout(local_api):
+    local_api.delay = 1
+    local_api.status = 200
+    with pytest.raises(urllib3.exceptions.HTTPError):
+        ebayAPItool.make_ebay_rest_request("token", "POST", "/sell/order", json_body={})
+    assert local_api.hits == ["POST"]